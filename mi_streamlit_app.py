@@ -1,8 +1,100 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import logging
 import os
 from datetime import datetime
+from io import StringIO
+from tempfile import SpooledTemporaryFile
+from numba import njit, prange
+
+
+# ---------------------------------
+# Shared logger (built once per process)
+# ---------------------------------
+@st.cache_resource
+def _get_logger():
+    log_buffer = StringIO()
+    logger = logging.getLogger("mi_logger")
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler(log_buffer)
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s | %(levelname)s | %(message)s"
+        ))
+        logger.addHandler(handler)
+    return logger, log_buffer
+
+
+# ---------------------------------
+# Numba kernel for large uploads
+# ---------------------------------
+# Below this row count the JIT warmup costs more than it saves,
+# so the plain NumPy path is used instead.
+numba_row_threshold = 500_000
+
+
+@njit(parallel=True, cache=True)
+def _compute_mi_columns(
+    bp, cp, q, risk_is_high,
+    investment, current, profit_loss,
+    status_codes, flag_codes
+):
+    for i in prange(bp.shape[0]):
+        inv = bp[i] * q[i]
+        cur = cp[i] * q[i]
+        pl = cur - inv
+        investment[i] = inv
+        current[i] = cur
+        profit_loss[i] = pl
+        status_codes[i] = 0 if pl > 0 else 1
+        flag_codes[i] = 0 if risk_is_high[i] else 1
+
+
+# ---------------------------------
+# Expected input schema
+# ---------------------------------
+required_columns = [
+    "Buy_Price",
+    "Quantity",
+    "Current_Price",
+    "Risk_Level",
+    "Sector"
+]
+
+# float32 halves the bytes moved by the arithmetic and is ample
+# precision for per-row prices and quantities; portfolio totals are
+# still accumulated in float64.
+column_dtypes = {
+    "Buy_Price": "float32[pyarrow]",
+    "Quantity": "float32[pyarrow]",
+    "Current_Price": "float32[pyarrow]",
+    "Risk_Level": "string[pyarrow]",
+    "Sector": "string[pyarrow]"
+}
+
+
+# ---------------------------------
+# Cached Excel loader
+# ---------------------------------
+@st.cache_data(show_spinner=False)
+def _load_xlsx(buf_bytes: bytes) -> pd.DataFrame:
+    # Spool uploads above 50 MB to disk so the parser does not
+    # work against a second full in-memory copy of the workbook.
+    with SpooledTemporaryFile(
+        max_size=50 * 1024 * 1024,
+        suffix=".xlsx"
+    ) as tmp:
+        tmp.write(buf_bytes)
+        tmp.seek(0)
+        return pd.read_excel(
+            tmp,
+            engine="calamine",
+            usecols=lambda col: col in required_columns,
+            dtype=column_dtypes,
+            dtype_backend="pyarrow"
+        )
+
 
 # ---------------------------------
 # App UI
@@ -20,10 +112,8 @@ st.write("Upload stock data Excel file and generate MI report with process log."
 # ---------------------------------
 base_folder = "app_output"
 output_folder = os.path.join(base_folder, "output")
-log_folder = os.path.join(base_folder, "logs")
 
 os.makedirs(output_folder, exist_ok=True)
-os.makedirs(log_folder, exist_ok=True)
 
 # ---------------------------------
 # File uploader
@@ -33,6 +123,11 @@ uploaded_file = st.file_uploader(
     type=["xlsx"]
 )
 
+generate_xlsx = st.checkbox(
+    "Also generate Excel workbook (slower)",
+    value=False
+)
+
 # ---------------------------------
 # Run button
 # ---------------------------------
@@ -40,29 +135,22 @@ if uploaded_file and st.button("🚀 Run Report"):
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    output_file = os.path.join(
+    parquet_file = os.path.join(
         output_folder,
-        f"stocks_mi_output_{timestamp}.xlsx"
+        f"stocks_mi_output_{timestamp}.parquet"
     )
 
-    log_file = os.path.join(
-        log_folder,
-        f"data_process_{timestamp}.log"
+    output_file = os.path.join(
+        output_folder,
+        f"stocks_mi_output_{timestamp}.xlsx"
     )
 
     # ---------------------------------
     # Custom Logger (Streamlit Cloud Safe)
     # ---------------------------------
-    logger = logging.getLogger("mi_logger")
-    logger.setLevel(logging.INFO)
-    logger.handlers.clear()
-
-    file_handler = logging.FileHandler(log_file)
-    formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(message)s"
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    logger, log_buffer = _get_logger()
+    log_buffer.seek(0)
+    log_buffer.truncate(0)
 
     logger.info("===== PROCESS STARTED =====")
 
@@ -70,20 +158,12 @@ if uploaded_file and st.button("🚀 Run Report"):
         # ---------------------------------
         # Read Excel
         # ---------------------------------
-        df = pd.read_excel(uploaded_file)
+        df = _load_xlsx(uploaded_file.getvalue())
         logger.info(f"Rows read: {len(df)}")
 
         # ---------------------------------
         # Column validation
         # ---------------------------------
-        required_columns = [
-            "Buy_Price",
-            "Quantity",
-            "Current_Price",
-            "Risk_Level",
-            "Sector"
-        ]
-
         missing_cols = [
             col for col in required_columns
             if col not in df.columns
@@ -94,29 +174,80 @@ if uploaded_file and st.button("🚀 Run Report"):
             st.error(f"❌ Missing columns: {missing_cols}")
             st.stop()
 
+        if df.empty:
+            logger.warning("Uploaded file has no data rows")
+            st.warning("⚠️ File has no data rows.")
+            st.stop()
+
         # ---------------------------------
         # Data Quality Checks
         # ---------------------------------
         logger.info("Running data quality checks")
-        logger.info(f"Null counts:\n{df.isnull().sum()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Null counts:\n%s", df.isnull().sum())
 
         # ---------------------------------
         # Business Calculations
         # ---------------------------------
-        df["Investment_Value"] = df["Buy_Price"] * df["Quantity"]
-        df["Current_Value"] = df["Current_Price"] * df["Quantity"]
-        df["Profit_Loss"] = (
-            df["Current_Value"] - df["Investment_Value"]
+        bp = df["Buy_Price"].to_numpy(
+            dtype="float32", na_value=0.0
+        )
+        cp = df["Current_Price"].to_numpy(
+            dtype="float32", na_value=0.0
+        )
+        q = df["Quantity"].to_numpy(
+            dtype="float32", na_value=0.0
+        )
+
+        # Casefold only the (tiny) category list, then answer the
+        # per-row question with an int8 code lookup. The extra slot
+        # at the end catches the -1 code of missing values.
+        risk_levels = df["Risk_Level"].astype("category")
+        cat_is_high = np.append(
+            np.asarray(
+                risk_levels.cat.categories.str.casefold() == "high"
+            ),
+            False
         )
+        risk_is_high = cat_is_high[
+            risk_levels.cat.codes.to_numpy()
+        ]
 
-        df["Status"] = df["Profit_Loss"].apply(
-            lambda x: "Profit" if x > 0 else "Loss"
+        if len(df) >= numba_row_threshold:
+            n = len(df)
+            investment = np.empty(n, dtype=np.float32)
+            current = np.empty(n, dtype=np.float32)
+            profit_loss = np.empty(n, dtype=np.float32)
+            status_codes = np.empty(n, dtype=np.int8)
+            flag_codes = np.empty(n, dtype=np.int8)
+            _compute_mi_columns(
+                bp, cp, q, risk_is_high,
+                investment, current, profit_loss,
+                status_codes, flag_codes
+            )
+        else:
+            investment = bp * q
+            current = cp * q
+            profit_loss = current - investment
+            status_codes = np.where(
+                profit_loss > 0, 0, 1
+            ).astype(np.int8)
+            flag_codes = np.where(
+                risk_is_high, 0, 1
+            ).astype(np.int8)
+
+        df["Investment_Value"] = investment
+        df["Current_Value"] = current
+        df["Profit_Loss"] = profit_loss
+
+        df["Status"] = pd.Categorical.from_codes(
+            status_codes,
+            categories=["Profit", "Loss"]
         )
 
-        df["High_Risk_Flag"] = df["Risk_Level"].apply(
-            lambda x: "Yes"
-            if str(x).lower() == "high"
-            else "No"
+        df["High_Risk_Flag"] = pd.Categorical.from_codes(
+            flag_codes,
+            categories=["Yes", "No"]
         )
 
         logger.info("Business calculations completed")
@@ -124,65 +255,98 @@ if uploaded_file and st.button("🚀 Run Report"):
         # ---------------------------------
         # Summary Tables
         # ---------------------------------
-        portfolio_summary = pd.DataFrame({
-            "Total_Investment": [
-                df["Investment_Value"].sum()
-            ],
-            "Total_Current_Value": [
-                df["Current_Value"].sum()
-            ],
-            "Net_Profit_Loss": [
-                df["Profit_Loss"].sum()
-            ]
-        })
+        inv_sum = float(investment.sum(dtype=np.float64))
+        cur_sum = float(current.sum(dtype=np.float64))
+        pl_sum = cur_sum - inv_sum
 
-        sector_summary = (
-            df.groupby("Sector", as_index=False)
-              ["Profit_Loss"].sum()
+        sector_codes, sectors = pd.factorize(
+            df["Sector"], sort=True
         )
+        known_sector = sector_codes >= 0
+        sector_summary = pd.DataFrame({
+            "Sector": np.asarray(sectors),
+            "Profit_Loss": np.bincount(
+                sector_codes[known_sector],
+                weights=profit_loss[known_sector],
+                minlength=len(sectors)
+            )
+        })
 
         logger.info("Summary tables created")
 
         # ---------------------------------
-        # Write Output Excel
+        # Write Output Files
         # ---------------------------------
-        with pd.ExcelWriter(
-            output_file,
-            engine="xlsxwriter"
-        ) as writer:
-            df.to_excel(
-                writer,
-                sheet_name="Detailed_Stock_Data",
-                index=False
-            )
-            portfolio_summary.to_excel(
-                writer,
-                sheet_name="Portfolio_Summary",
-                index=False
-            )
-            sector_summary.to_excel(
-                writer,
-                sheet_name="Sector_Summary",
-                index=False
-            )
+        df.to_parquet(
+            parquet_file,
+            engine="pyarrow",
+            compression="snappy"
+        )
 
-        logger.info("Output Excel generated successfully")
-        logger.info("===== PROCESS COMPLETED =====")
+        logger.info("Output Parquet generated successfully")
+
+        if generate_xlsx:
+            with pd.ExcelWriter(
+                output_file,
+                engine="xlsxwriter",
+                engine_kwargs={
+                    "options": {
+                        "constant_memory": True,
+                        "strings_to_numbers": False
+                    }
+                }
+            ) as writer:
+                # constant_memory flushes rows sequentially, so the
+                # detailed sheet is written row-wise like the summary
+                # sheets; to_excel emits cells column-major, which
+                # constant_memory would silently drop.
+                detail_sheet = writer.book.add_worksheet(
+                    "Detailed_Stock_Data"
+                )
+                detail_sheet.write_row(
+                    0, 0, df.columns.tolist()
+                )
+                for row_idx, row in enumerate(
+                    df.itertuples(index=False),
+                    start=1
+                ):
+                    detail_sheet.write_row(row_idx, 0, [
+                        None if pd.isna(cell) else cell
+                        for cell in row
+                    ])
+                portfolio_sheet = writer.book.add_worksheet(
+                    "Portfolio_Summary"
+                )
+                portfolio_sheet.write_row(0, 0, [
+                    "Total_Investment",
+                    "Total_Current_Value",
+                    "Net_Profit_Loss"
+                ])
+                portfolio_sheet.write_row(
+                    1, 0, [inv_sum, cur_sum, pl_sum]
+                )
+                sector_sheet = writer.book.add_worksheet(
+                    "Sector_Summary"
+                )
+                sector_sheet.write_row(
+                    0, 0, sector_summary.columns.tolist()
+                )
+                for row_idx, row in enumerate(
+                    sector_summary.itertuples(index=False),
+                    start=1
+                ):
+                    sector_sheet.write_row(row_idx, 0, row)
+
+            logger.info("Output Excel generated successfully")
 
-        # ---------------------------------
-        # Flush & Close Logger (CRITICAL)
-        # ---------------------------------
-        for handler in logger.handlers:
-            handler.flush()
-            handler.close()
+        logger.info("===== PROCESS COMPLETED =====")
 
         st.success("✅ Report generated successfully!")
 
         # ---------------------------------
         # Log Preview in UI
         # ---------------------------------
-        with open(log_file, "r") as f:
-            log_text = f.read()
+        log_text = log_buffer.getvalue()
 
         st.subheader("📄 Process Log Preview")
         st.text_area(
@@ -194,25 +358,38 @@ if uploaded_file and st.button("🚀 Run Report"):
         # ---------------------------------
         # Download Buttons
         # ---------------------------------
-        with open(output_file, "rb") as f:
+        with open(parquet_file, "rb") as f:
             st.download_button(
-                label="⬇️ Download MI Output Excel",
+                label="⬇️ Download MI Output Parquet",
                 data=f,
-                file_name=os.path.basename(output_file)
+                file_name=os.path.basename(parquet_file)
             )
 
-        with open(log_file, "rb") as f:
-            st.download_button(
-                label="⬇️ Download Process Log",
-                data=f,
-                file_name=os.path.basename(log_file)
-            )
+        if generate_xlsx:
+            with open(output_file, "rb") as f:
+                st.download_button(
+                    label="⬇️ Download MI Output Excel",
+                    data=f,
+                    file_name=os.path.basename(output_file)
+                )
+
+        st.download_button(
+            label="⬇️ Download Process Log",
+            data=log_text,
+            file_name=f"data_process_{timestamp}.log"
+        )
 
-    except Exception as e:
+    except Exception:
         logger.error(
             "Process failed",
             exc_info=True
         )
 
-        for handler in logger.handlers:
-            hand
+        st.error("❌ Process failed — see log below.")
+
+        st.subheader("📄 Process Log Preview")
+        st.text_area(
+            "Log details",
+            log_buffer.getvalue(),
+            height=300
+        )